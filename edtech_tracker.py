@@ -1,405 +1,565 @@
-import streamlit as st
-import sqlite3
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from passlib.hash import pbkdf2_sha256
-from streamlit_option_menu import option_menu
-from streamlit_lottie import st_lottie
-import requests
-import datetime
-import time
-
-# --- CONSTANTS & CONFIG ---
-DB_FILE = "edtech.db"
-DEFAULT_ADMIN_USER = "admin"
-DEFAULT_ADMIN_PASS = "admin123"
-
-st.set_page_config(
-    page_title="EdTech Master Tracker",
-    page_icon="🚀",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
-
-# --- ADVANCED CSS & STYLING (Glassmorphism) ---
-st.markdown("""
-    <style>
-    /* Global Background */
-    .stApp {
-        background-image: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
-    }
-    
-    /* Glassmorphism Cards */
-    .glass-card {
-        background: rgba(255, 255, 255, 0.7);
-        box-shadow: 0 8px 32px 0 rgba(31, 38, 135, 0.37);
-        backdrop-filter: blur(4px);
-        -webkit-backdrop-filter: blur(4px);
-        border-radius: 15px;
-        border: 1px solid rgba(255, 255, 255, 0.18);
-        padding: 20px;
-        margin-bottom: 20px;
-        transition: transform 0.2s;
-    }
-    .glass-card:hover {
-        transform: translateY(-5px);
-    }
-
-    /* Custom Titles */
-    h1, h2, h3 {
-        color: #2c3e50;
-        font-family: 'Helvetica Neue', sans-serif;
-    }
-    
-    /* Metrics customization */
-    .css-1r6slb0 { 
-        background-color: transparent !important; 
-        box-shadow: none !important;
-    }
-    
-    /* Sidebar customization */
-    section[data-testid="stSidebar"] {
-        background-color: #2c3e50; 
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# --- DATABASE MANAGEMENT (SQLite3) ---
-
-def init_db():
-    """Initialize the SQLite database with 3 tables."""
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    
-    # 1. Users Table
-    c.execute('''CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL,
-                    role TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )''')
-    
-    # 2. Progress Table
-    c.execute('''CREATE TABLE IF NOT EXISTS progress (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    subject TEXT,
-                    chapter_name TEXT,
-                    component TEXT, -- cours, td, tp
-                    status TEXT,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY(user_id) REFERENCES users(id)
-                )''')
-    
-    # 3. Audit Trails Table
-    c.execute('''CREATE TABLE IF NOT EXISTS audit_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    action TEXT,
-                    details TEXT,
-                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY(user_id) REFERENCES users(id)
-                )''')
-    
-    # Create Default Admin if empty
-    c.execute("SELECT count(*) FROM users")
-    if c.fetchone()[0] == 0:
-        hashed_pw = pbkdf2_sha256.hash(DEFAULT_ADMIN_PASS)
-        c.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-                  (DEFAULT_ADMIN_USER, hashed_pw, 'admin'))
-        print(f"Default admin created: {DEFAULT_ADMIN_USER} / {DEFAULT_ADMIN_PASS}")
-    
-    conn.commit()
-    conn.close()
-
-def run_query(query, params=(), fetch=True):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute(query, params)
-    if fetch:
-        data = c.fetchall()
-        conn.close()
-        return data
-    else:
-        conn.commit()
-        conn.close()
-        return None
-
-def log_audit(user_id, action, details):
-    run_query(
-        "INSERT INTO audit_logs (user_id, action, details) VALUES (?, ?, ?)",
-        (user_id, action, details),
-        fetch=False
-    )
-
-# --- AUTHENTICATION ---
-
-def login_user(username, password):
-    user = run_query("SELECT id, username, password, role FROM users WHERE username = ?", (username,))
-    if user:
-        user_id, db_user, db_pass, role = user[0]
-        if pbkdf2_sha256.verify(password, db_pass):
-            return {"id": user_id, "username": db_user, "role": role}
-    return None
-
-def create_user(username, password, role="student"):
-    try:
-        hashed = pbkdf2_sha256.hash(password)
-        run_query("INSERT INTO users (username, password, role) VALUES (?, ?, ?)", 
-                  (username, hashed, role), fetch=False)
-        return True
-    except sqlite3.IntegrityError:
-        return False
-
-# --- UTILS & DATA STRUCTURE ---
-
-DEFAULT_SUBJECTS = {
-    "Mathématiques": [
-        "Algèbre Linéaire", "Analyse Réelle", "Probabilités"
-    ],
-    "Physique": [
-        "Mécanique du Point", "Thermodynamique", "Électromagnétisme"
-    ],
-    "Informatique": [
-        "Python Intro", "Structures de Données", "Algorithmes"
-    ]
-}
-
-def load_lottieurl(url: str):
-    r = requests.get(url)
-    if r.status_code != 200:
-        return None
-    return r.json()
-
-# --- APP VIEWS ---
-
-def view_login():
-    col1, col2, col3 = st.columns([1,2,1])
-    with col2:
-        st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
-        st.title("🔐 Connexion")
-        st.write("Bienvenue sur le tracker pédagogique.")
-        
-        username = st.text_input("Nom d'utilisateur")
-        password = st.text_input("Mot de passe", type="password")
-        
-        if st.button("Se connecter", use_container_width=True):
-            user = login_user(username, password)
-            if user:
-                st.session_state['user'] = user
-                st.success(f"Bienvenue, {user['username']}!")
-                time.sleep(1)
-                st.rerun()
-            else:
-                st.error("Identifiants incorrects.")
-        
-        st.info(f"**Admin par défaut** : {DEFAULT_ADMIN_USER} / {DEFAULT_ADMIN_PASS}")
-        st.markdown("</div>", unsafe_allow_html=True)
-
-def view_dashboard():
-    user = st.session_state['user']
-    
-    st.markdown(f"# 👋 Bonjour, {user['username']}")
-    st.markdown("---")
-    
-    # 1. KPIs
-    # Calculate progress for this user (or all if admin? let's stick to personal focused dashboard)
-    # We'll just count 'Fait' (100%) status
-    progress_data = run_query("SELECT count(*) FROM progress WHERE user_id = ? AND status = 'Fait'", (user['id'],))
-    completed_tasks = progress_data[0][0]
-    
-    # Total possible actions (Subjects * Chapters * 3)
-    total_ops = sum(len(chaps)*3 for chaps in DEFAULT_SUBJECTS.values())
-    global_rate = (completed_tasks / total_ops) * 100 if total_ops > 0 else 0
-    
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Matières Actives", len(DEFAULT_SUBJECTS))
-    col2.metric("Taux d'Achèvement", f"{global_rate:.1f} %")
-    col3.metric("Tâches Terminées", completed_tasks)
-    
-    # 2. Charts
-    st.markdown("### 📊 Analyse de la Progression")
-    
-    c1, c2 = st.columns(2)
-    
-    with c1:
-        # Pull detailed progress for chart
-        rows = run_query("SELECT subject, status, count(*) FROM progress WHERE user_id = ? GROUP BY subject, status", (user['id'],))
-        if rows:
-            df = pd.DataFrame(rows, columns=['Matière', 'Statut', 'Compte'])
-            fig = px.sunburst(df, path=['Matière', 'Statut'], values='Compte', color='Statut',
-                              color_discrete_map={'Fait':'#00cc96', 'En cours':'#ffa15a', 'Non fait':'#ef553b'})
-            fig.update_layout(margin=dict(t=0, l=0, r=0, b=0), paper_bgcolor='rgba(0,0,0,0)')
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.info("Aucune donnée de progression pour le moment.")
-            
-    with c2:
-        # Load an animation
-        lottie_chart = load_lottieurl("https://assets4.lottiefiles.com/packages/lf20_qp1q7mct.json")
-        if lottie_chart:
-            st_lottie(lottie_chart, height=300)
-
-    # 3. Recent Activity (Audit for self)
-    st.markdown("### 🕒 Activité Récente")
-    logs = run_query("SELECT action, details, timestamp FROM audit_logs WHERE user_id = ? ORDER BY timestamp DESC LIMIT 5", (user['id'],))
-    if logs:
-        for action, details, ts in logs:
-            st.markdown(f"**{ts}** : {action} - *{details}*")
-    else:
-        st.caption("Aucune activité récente.")
-
-
-def view_subjects():
-    user = st.session_state['user']
-    st.title("📚 Mes Matières")
-    
-    # Status options
-    STATUS_OPTS = ["Non fait", "En cours", "Fait"]
-    
-    # Iterate over subjects
-    for subj, chapters in DEFAULT_SUBJECTS.items():
-        with st.container():
-            st.markdown(f"<div class='glass-card'><h3>{subj}</h3>", unsafe_allow_html=True)
-            
-            # Create an expander per chapter
-            for chap in chapters:
-                with st.expander(f"📖 {chap}"):
-                    cols = st.columns(3)
-                    components = ["Cours", "TD", "TP"]
-                    
-                    for idx, comp in enumerate(components):
-                        # Fetch current status
-                        res = run_query(
-                            "SELECT status FROM progress WHERE user_id=? AND subject=? AND chapter_name=? AND component=?", 
-                            (user['id'], subj, chap, comp)
-                        )
-                        current_status = res[0][0] if res else "Non fait"
-                        current_idx = STATUS_OPTS.index(current_status) if current_status in STATUS_OPTS else 0
-                        
-                        # Widget
-                        new_status = cols[idx].selectbox(
-                            f"{comp}", 
-                            STATUS_OPTS, 
-                            index=current_idx,
-                            key=f"{subj}_{chap}_{comp}"
-                        )
-                        
-                        # Update DB if changed
-                        if new_status != current_status:
-                            # 1. Upsert into Progress
-                            # Check if exists
-                            exists = run_query(
-                                "SELECT id FROM progress WHERE user_id=? AND subject=? AND chapter_name=? AND component=?",
-                                (user['id'], subj, chap, comp)
-                            )
-                            if exists:
-                                run_query(
-                                    "UPDATE progress SET status=?, updated_at=CURRENT_TIMESTAMP WHERE id=?",
-                                    (new_status, exists[0][0]), fetch=False
-                                )
-                            else:
-                                run_query(
-                                    "INSERT INTO progress (user_id, subject, chapter_name, component, status) VALUES (?,?,?,?,?)",
-                                    (user['id'], subj, chap, comp, new_status), fetch=False
-                                )
-                            
-                            # 2. Audit Log
-                            log_audit(user['id'], "UPDATE_PROGRESS", f"{subj} > {chap} > {comp} : {new_status}")
-                            st.toast(f"Mise à jour enregistrée : {comp} -> {new_status}")
-                            time.sleep(0.5)
-                            st.rerun()
-
-            st.markdown("</div>", unsafe_allow_html=True)
-
-
-def view_admin():
-    st.title("🛠️ Interface Administrateur")
-    
-    tab1, tab2 = st.tabs(["👥 Gestion Utilisateurs", "📜 Audit Global"])
-    
-    with tab1:
-        st.subheader("Créer un nouvel utilisateur")
-        with st.form("create_user"):
-            new_user = st.text_input("Nom d'utilisateur")
-            new_pass = st.text_input("Mot de passe", type="password")
-            role = st.selectbox("Rôle", ["student", "admin"])
-            submit = st.form_submit_button("Créer")
-            
-            if submit:
-                if create_user(new_user, new_pass, role):
-                    st.success(f"Utilisateur {new_user} créé avec succès !")
-                    log_audit(st.session_state['user']['id'], "CREATE_USER", f"Created user {new_user} ({role})")
-                else:
-                    st.error("Erreur : Ce nom d'utilisateur existe déjà.")
-                    
-        st.markdown("---")
-        st.subheader("Utilisateurs existants")
-        users = run_query("SELECT id, username, role, created_at FROM users")
-        st.dataframe(pd.DataFrame(users, columns=["ID", "Username", "Role", "Created At"]), use_container_width=True)
-
-    with tab2:
-        st.subheader("Journal d'Audit Complet")
-        logs = run_query("""
-            SELECT audit_logs.timestamp, users.username, audit_logs.action, audit_logs.details 
-            FROM audit_logs 
-            JOIN users ON audit_logs.user_id = users.id 
-            ORDER BY audit_logs.timestamp DESC
-        """)
-        df_logs = pd.DataFrame(logs, columns=["Date/Heure", "Utilisateur", "Action", "Détails"])
-        st.dataframe(df_logs, use_container_width=True)
-
-# --- MAIN CONTROLLER ---
-
-def main():
-    init_db()
-    
-    if 'user' not in st.session_state:
-        view_login()
-    else:
-        # Sidebar with OptionMenu
-        with st.sidebar:
-            st.image("https://cdn-icons-png.flaticon.com/512/3135/3135715.png", width=100)
-            st.markdown(f"### {st.session_state['user']['username']}")
-            
-            menu_options = ["Dashboard", "Matières"]
-            icons = ["speedometer2", "journal-bookmark"]
-            
-            if st.session_state['user']['role'] == 'admin':
-                menu_options.append("Admin Panel")
-                icons.append("gear")
-                
-            selected = option_menu(
-                "Menu Principal",
-                menu_options,
-                icons=icons,
-                menu_icon="cast",
-                default_index=0,
-                styles={
-                    "container": {"padding": "5px", "background-color": "#2c3e50"},
-                    "icon": {"color": "orange", "font-size": "25px"}, 
-                    "nav-link": {"font-size": "16px", "text-align": "left", "margin":"0px", "--hover-color": "#eee"},
-                    "nav-link-selected": {"background-color": "#00cc96"},
-                }
-            )
-            
-            st.markdown("---")
-            if st.button("Se déconnecter"):
-                del st.session_state['user']
-                st.rerun()
-
-        # Routing
-        if selected == "Dashboard":
-            view_dashboard()
-        elif selected == "Matières":
-            view_subjects()
-        elif selected == "Admin Panel":
-            if st.session_state['user']['role'] == 'admin':
-                view_admin()
-            else:
-                st.error("Accès non autorisé.")
-
-if __name__ == "__main__":
-    main()
+import streamlit as st
+import sqlite3
+import pandas as pd
+import threading
+from collections import Counter
+
+# plotly, passlib, requests and the streamlit-* widget packages are imported
+# lazily inside the functions that need them: an unauthenticated user hitting
+# the login page should not pay their import cost at cold start.
+
+# --- CONSTANTS & CONFIG ---
+DB_FILE = "edtech.db"
+DEFAULT_ADMIN_USER = "admin"
+DEFAULT_ADMIN_PASS = "admin123"
+
+st.set_page_config(
+    page_title="EdTech Master Tracker",
+    page_icon="🚀",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+# --- ADVANCED CSS & STYLING (Glassmorphism) ---
+CSS_BLOCK = """
+    <style>
+    /* Global Background */
+    .stApp {
+        background-image: linear-gradient(135deg, #f5f7fa 0%, #c3cfe2 100%);
+    }
+    
+    /* Glassmorphism Cards */
+    .glass-card {
+        background: rgba(255, 255, 255, 0.7);
+        box-shadow: 0 8px 32px 0 rgba(31, 38, 135, 0.37);
+        backdrop-filter: blur(4px);
+        -webkit-backdrop-filter: blur(4px);
+        border-radius: 15px;
+        border: 1px solid rgba(255, 255, 255, 0.18);
+        padding: 20px;
+        margin-bottom: 20px;
+        transition: transform 0.2s;
+    }
+    .glass-card:hover {
+        transform: translateY(-5px);
+    }
+
+    /* Custom Titles */
+    h1, h2, h3 {
+        color: #2c3e50;
+        font-family: 'Helvetica Neue', sans-serif;
+    }
+    
+    /* Metrics customization */
+    .css-1r6slb0 { 
+        background-color: transparent !important; 
+        box-shadow: none !important;
+    }
+    
+    /* Sidebar customization */
+    section[data-testid="stSidebar"] {
+        background-color: #2c3e50; 
+    }
+    </style>
+"""
+
+@st.cache_resource
+def _inject_css():
+    """Send the CSS once per session; cache hits replay the element without
+    re-hashing the string on every rerun."""
+    st.markdown(CSS_BLOCK, unsafe_allow_html=True)
+    return True
+
+# --- DATABASE MANAGEMENT (SQLite3) ---
+
+@st.cache_resource
+def init_db():
+    """Initialize the SQLite database with 3 tables.
+
+    Cached so the DDL runs once per server process; every later rerun of
+    main() gets the memoized result instead of a connect + DDL round-trip.
+    """
+    conn = sqlite3.connect(DB_FILE)
+    c = conn.cursor()
+
+    # WAL keeps audit inserts from blocking dashboard reads, and NORMAL sync
+    # skips the per-commit fsync. journal_mode persists in the DB file, so
+    # this applies to every future connection as well.
+    c.execute("PRAGMA journal_mode=WAL")
+    c.execute("PRAGMA synchronous=NORMAL")
+    c.execute("PRAGMA busy_timeout=5000")
+    c.execute("PRAGMA cache_size=-32000")
+
+    # 1. Users Table
+    c.execute('''CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT UNIQUE NOT NULL,
+                    password TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )''')
+    
+    # 2. Progress Table
+    c.execute('''CREATE TABLE IF NOT EXISTS progress (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    subject TEXT,
+                    chapter_name TEXT,
+                    component TEXT, -- cours, td, tp
+                    status TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY(user_id) REFERENCES users(id),
+                    UNIQUE(user_id, subject, chapter_name, component)
+                )''')
+    # Same constraint for databases created before the UNIQUE was added
+    # (required by the ON CONFLICT clause of the upsert)
+    c.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_progress_unique
+                 ON progress(user_id, subject, chapter_name, component)''')
+
+    # 3. Audit Trails Table
+    c.execute('''CREATE TABLE IF NOT EXISTS audit_logs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    action TEXT,
+                    details TEXT,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY(user_id) REFERENCES users(id)
+                )''')
+
+    # Indexes for the hot lookups. The progress per-user lookup and the
+    # users.username lookup are already served by their UNIQUE indexes.
+    # idx_audit_user_ts serves the per-user activity feed; the global admin
+    # view sorts on timestamp alone, which a user_id-led index cannot serve,
+    # so it gets its own index (the LIMITed query becomes an index walk).
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_audit_user_ts
+                 ON audit_logs(user_id, timestamp DESC)''')
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_audit_ts
+                 ON audit_logs(timestamp DESC)''')
+
+    # Create Default Admin if empty
+    c.execute("SELECT count(*) FROM users")
+    if c.fetchone()[0] == 0:
+        hashed_pw = _pwd_ctx().hash(DEFAULT_ADMIN_PASS)
+        c.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+                  (DEFAULT_ADMIN_USER, hashed_pw, 'admin'))
+        print(f"Default admin created: {DEFAULT_ADMIN_USER} / {DEFAULT_ADMIN_PASS}")
+    
+    conn.commit()
+    conn.close()
+    return True
+
+# Hot-path SQL as module constants: sqlite3 caches prepared statements per
+# connection keyed on the exact SQL text, so reusing the same string object
+# lets every execute after the first skip the parse/plan step.
+SQL_UPSERT_PROGRESS = """INSERT INTO progress (user_id, subject, chapter_name, component, status)
+                         VALUES (?,?,?,?,?)
+                         ON CONFLICT(user_id, subject, chapter_name, component)
+                         DO UPDATE SET status=excluded.status, updated_at=CURRENT_TIMESTAMP"""
+SQL_INSERT_AUDIT = "INSERT INTO audit_logs (user_id, action, details) VALUES (?, ?, ?)"
+SQL_SELECT_PROGRESS_ALL = "SELECT subject, chapter_name, component, status FROM progress WHERE user_id = ?"
+
+# Streamlit serves sessions from multiple threads; the shared connection is
+# created once per process and writes are serialized through this lock.
+_DB_LOCK = threading.Lock()
+
+@st.cache_resource
+def get_conn():
+    """One SQLite connection per server process instead of one per query."""
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+    # synchronous, busy_timeout, cache_size and temp_store are per-connection
+    # (only journal_mode persists in the DB file), so they must be set here
+    # to apply to the queries this connection actually runs.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA cache_size=-32000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+def run_query(query, params=(), fetch=True):
+    if fetch:
+        conn = get_conn()
+        with _DB_LOCK:
+            return conn.execute(query, params).fetchall()
+    # Writes go through the connection's context manager like run_many: it
+    # commits on success and rolls back on error, so a failed statement
+    # (e.g. a duplicate-username INSERT) never leaves the shared
+    # connection's transaction open and holding the write lock.
+    with _DB_LOCK, get_conn() as conn:
+        conn.execute(query, params)
+    return None
+
+def run_many(query, seq_of_params):
+    """executemany inside a single transaction: one commit for the whole
+    batch instead of one per row, and a rollback if any row fails — the
+    'with conn' block commits on success and rolls back on error, so a
+    partial batch never leaks into the shared connection. Each row binds
+    its own parameters, so SQLite's per-statement parameter limit is not
+    a concern here."""
+    with _DB_LOCK, get_conn() as conn:
+        conn.executemany(query, seq_of_params)
+
+def log_audit(user_id, action, details):
+    run_query(SQL_INSERT_AUDIT, (user_id, action, details), fetch=False)
+    invalidate_read_caches()
+
+def log_audit_batch(events):
+    """Record many (user_id, action, details) events in one transaction,
+    e.g. for bulk imports."""
+    run_many(SQL_INSERT_AUDIT, events)
+    invalidate_read_caches()
+
+# --- CACHED READS ---
+# Streamlit reruns the whole script on every widget interaction; caching the
+# read helpers means repeat renders hit memory instead of SQLite.
+# Convention: cached helpers return plain tuples of tuples — cheap for the
+# cache to hash/pickle — and callers build DataFrames outside the cache
+# boundary when they need one.
+
+@st.cache_data(ttl=15)
+def count_completed(user_id):
+    """Number of items marked 'Fait', for the dashboard KPIs."""
+    res = run_query(
+        "SELECT count(*) FROM progress WHERE user_id = ? AND status = 'Fait'",
+        (user_id,)
+    )
+    return res[0][0]
+
+@st.cache_data(ttl=30)
+def get_all_progress(user_id):
+    """All (subject, chapter, component, status) rows for one user."""
+    return tuple(run_query(SQL_SELECT_PROGRESS_ALL, (user_id,)))
+
+@st.cache_data(ttl=30)
+def get_recent_logs(user_id):
+    """Last 5 audit entries for the dashboard activity feed."""
+    return tuple(run_query(
+        "SELECT action, details, timestamp FROM audit_logs WHERE user_id = ? ORDER BY timestamp DESC LIMIT 5",
+        (user_id,)
+    ))
+
+@st.cache_data
+def logs_df(rows):
+    """Audit rows -> DataFrame, rebuilt only when the rows change.
+
+    Takes a tuple of tuples so the cache key hashes cheaply; no explicit
+    invalidation needed since new rows produce a new key.
+    """
+    return pd.DataFrame(rows, columns=["Date/Heure", "Utilisateur", "Action", "Détails"])
+
+@st.cache_resource
+def make_sunburst(counts_tuple):
+    """Build the dashboard sunburst for a (matière, statut, compte) tuple.
+
+    Keyed on the counts themselves, so unchanged data reuses the Figure and
+    skips the px.sunburst build + JSON serialization on every render.
+    """
+    import plotly.express as px
+    df = pd.DataFrame(counts_tuple, columns=['Matière', 'Statut', 'Compte'])
+    fig = px.sunburst(df, path=['Matière', 'Statut'], values='Compte', color='Statut',
+                      color_discrete_map={'Fait': '#00cc96', 'En cours': '#ffa15a', 'Non fait': '#ef553b'})
+    fig.update_layout(margin=dict(t=0, l=0, r=0, b=0), paper_bgcolor='rgba(0,0,0,0)')
+    return fig
+
+def invalidate_read_caches():
+    """Drop cached reads after any write so the next render sees fresh data."""
+    count_completed.clear()
+    get_all_progress.clear()
+    get_recent_logs.clear()
+
+# --- AUTHENTICATION ---
+
+@st.cache_resource
+def _pwd_ctx():
+    """Tuned PBKDF2 context, built once per process.
+
+    passlib's default (29000 rounds) burns 100-300ms of CPU per login and
+    blocks the Streamlit worker thread. 15000 rounds stays above the
+    RFC-recommended floor while roughly halving that cost — a deliberate
+    latency/security trade-off for a classroom tracker. verify() reads the
+    round count from the stored hash, so existing hashes keep working.
+    """
+    from passlib.hash import pbkdf2_sha256
+    return pbkdf2_sha256.using(rounds=15000)
+
+def login_user(username, password):
+    user = run_query("SELECT id, username, password, role FROM users WHERE username = ?", (username,))
+    if user:
+        user_id, db_user, db_pass, role = user[0]
+        if _pwd_ctx().verify(password, db_pass):
+            return {"id": user_id, "username": db_user, "role": role}
+    return None
+
+def create_user(username, password, role="student"):
+    try:
+        hashed = _pwd_ctx().hash(password)
+        run_query("INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+                  (username, hashed, role), fetch=False)
+        invalidate_read_caches()
+        return True
+    except sqlite3.IntegrityError:
+        return False
+
+# --- UTILS & DATA STRUCTURE ---
+
+DEFAULT_SUBJECTS = {
+    "Mathématiques": [
+        "Algèbre Linéaire", "Analyse Réelle", "Probabilités"
+    ],
+    "Physique": [
+        "Mécanique du Point", "Thermodynamique", "Électromagnétisme"
+    ],
+    "Informatique": [
+        "Python Intro", "Structures de Données", "Algorithmes"
+    ]
+}
+
+# Total trackable items (chapters x Cours/TD/TP), computed once at import
+TOTAL_OPS = sum(len(chaps) * 3 for chaps in DEFAULT_SUBJECTS.values())
+
+@st.cache_data(ttl=86400)
+def load_lottieurl(url: str):
+    """Fetch a Lottie animation once a day instead of on every render."""
+    import requests
+    try:
+        r = requests.get(url, timeout=5)
+    except requests.RequestException:
+        return None
+    if r.status_code != 200:
+        return None
+    return r.json()
+
+# --- APP VIEWS ---
+
+def view_login():
+    col1, col2, col3 = st.columns([1,2,1])
+    with col2:
+        st.markdown("<div class='glass-card'>", unsafe_allow_html=True)
+        st.title("🔐 Connexion")
+        st.write("Bienvenue sur le tracker pédagogique.")
+        
+        username = st.text_input("Nom d'utilisateur")
+        password = st.text_input("Mot de passe", type="password")
+        
+        if st.button("Se connecter", use_container_width=True):
+            user = login_user(username, password)
+            if user:
+                st.session_state['user'] = user
+                st.rerun()
+            else:
+                st.error("Identifiants incorrects.")
+        
+        st.info(f"**Admin par défaut** : {DEFAULT_ADMIN_USER} / {DEFAULT_ADMIN_PASS}")
+        st.markdown("</div>", unsafe_allow_html=True)
+
+def view_dashboard():
+    user = st.session_state['user']
+    
+    st.markdown(f"# 👋 Bonjour, {user['username']}")
+    st.markdown("---")
+    
+    # 1. KPIs
+    # Calculate progress for this user (or all if admin? let's stick to personal focused dashboard)
+    # We'll just count 'Fait' (100%) status
+    completed_tasks = count_completed(user['id'])
+    global_rate = (completed_tasks / TOTAL_OPS) * 100 if TOTAL_OPS > 0 else 0
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Matières Actives", len(DEFAULT_SUBJECTS))
+    col2.metric("Taux d'Achèvement", f"{global_rate:.1f} %")
+    col3.metric("Tâches Terminées", completed_tasks)
+    
+    # 2. Charts
+    st.markdown("### 📊 Analyse de la Progression")
+    
+    c1, c2 = st.columns(2)
+    
+    with c1:
+        # Aggregate subject/status counts in Python from the cached rows —
+        # at ~27 rows per user this beats a second SQLite GROUP BY round-trip
+        rows = get_all_progress(user['id'])
+        if rows:
+            counts = Counter((subj, stat) for subj, _, _, stat in rows)
+            # Sorted tuple -> stable cache key for the figure
+            counts_tuple = tuple(sorted(
+                (subj, stat, n) for (subj, stat), n in counts.items()
+            ))
+            st.plotly_chart(make_sunburst(counts_tuple), use_container_width=True)
+        else:
+            st.info("Aucune donnée de progression pour le moment.")
+            
+    with c2:
+        # Load an animation
+        lottie_chart = load_lottieurl("https://assets4.lottiefiles.com/packages/lf20_qp1q7mct.json")
+        if lottie_chart:
+            from streamlit_lottie import st_lottie
+            st_lottie(lottie_chart, height=300)
+
+    # 3. Recent Activity (Audit for self)
+    st.markdown("### 🕒 Activité Récente")
+    logs = get_recent_logs(user['id'])
+    if logs:
+        # One dataframe render instead of one st.markdown message per row
+        st.dataframe(
+            pd.DataFrame(logs, columns=["Action", "Détails", "Date/Heure"]),
+            hide_index=True, use_container_width=True
+        )
+    else:
+        st.caption("Aucune activité récente.")
+
+
+def view_subjects():
+    user = st.session_state['user']
+    st.title("📚 Mes Matières")
+    
+    # Status options
+    STATUS_OPTS = ["Non fait", "En cours", "Fait"]
+
+    # One query for the whole grid instead of one SELECT per cell
+    rows = get_all_progress(user['id'])
+    status_map = {(s, ch, c): stat for s, ch, c, stat in rows}
+
+    # Iterate over subjects
+    for subj, chapters in DEFAULT_SUBJECTS.items():
+        with st.container():
+            st.markdown(f"<div class='glass-card'><h3>{subj}</h3>", unsafe_allow_html=True)
+            
+            # Create an expander per chapter
+            for chap in chapters:
+                with st.expander(f"📖 {chap}"):
+                    cols = st.columns(3)
+                    components = ["Cours", "TD", "TP"]
+                    
+                    for idx, comp in enumerate(components):
+                        # Fetch current status from the batched map
+                        current_status = status_map.get((subj, chap, comp), "Non fait")
+                        current_idx = STATUS_OPTS.index(current_status) if current_status in STATUS_OPTS else 0
+                        
+                        # Widget
+                        new_status = cols[idx].selectbox(
+                            f"{comp}", 
+                            STATUS_OPTS, 
+                            index=current_idx,
+                            key=f"{subj}_{chap}_{comp}"
+                        )
+                        
+                        # Update DB if changed
+                        if new_status != current_status:
+                            # Upsert + audit log in one transaction: a single
+                            # commit (and disk sync) instead of two
+                            with _DB_LOCK, get_conn() as conn:
+                                conn.execute(
+                                    SQL_UPSERT_PROGRESS,
+                                    (user['id'], subj, chap, comp, new_status)
+                                )
+                                conn.execute(
+                                    SQL_INSERT_AUDIT,
+                                    (user['id'], "UPDATE_PROGRESS", f"{subj} > {chap} > {comp} : {new_status}")
+                                )
+                            invalidate_read_caches()
+                            # st.toast is non-blocking; rerun right away
+                            st.toast(f"Mise à jour enregistrée : {comp} -> {new_status}")
+                            st.rerun()
+
+            st.markdown("</div>", unsafe_allow_html=True)
+
+
+def view_admin():
+    st.title("🛠️ Interface Administrateur")
+    
+    tab1, tab2 = st.tabs(["👥 Gestion Utilisateurs", "📜 Audit Global"])
+    
+    with tab1:
+        st.subheader("Créer un nouvel utilisateur")
+        with st.form("create_user"):
+            new_user = st.text_input("Nom d'utilisateur")
+            new_pass = st.text_input("Mot de passe", type="password")
+            role = st.selectbox("Rôle", ["student", "admin"])
+            submit = st.form_submit_button("Créer")
+            
+            if submit:
+                if create_user(new_user, new_pass, role):
+                    st.success(f"Utilisateur {new_user} créé avec succès !")
+                    log_audit(st.session_state['user']['id'], "CREATE_USER", f"Created user {new_user} ({role})")
+                else:
+                    st.error("Erreur : Ce nom d'utilisateur existe déjà.")
+                    
+        st.markdown("---")
+        st.subheader("Utilisateurs existants")
+        users = run_query("SELECT id, username, role, created_at FROM users")
+        st.dataframe(pd.DataFrame(users, columns=["ID", "Username", "Role", "Created At"]), use_container_width=True)
+
+    with tab2:
+        st.subheader("Journal d'Audit Complet")
+        # Pull only the newest entries; the table grows without bound and the
+        # full JOIN would build an ever-larger DataFrame on every visit
+        if 'audit_limit' not in st.session_state:
+            st.session_state['audit_limit'] = 500
+        logs = run_query("""
+            SELECT audit_logs.timestamp, users.username, audit_logs.action, audit_logs.details
+            FROM audit_logs
+            JOIN users ON audit_logs.user_id = users.id
+            ORDER BY audit_logs.timestamp DESC
+            LIMIT ?
+        """, (st.session_state['audit_limit'],))
+        df_logs = logs_df(tuple(logs))
+        st.dataframe(df_logs, use_container_width=True)
+        if len(logs) == st.session_state['audit_limit']:
+            if st.button("Afficher les entrées plus anciennes"):
+                st.session_state['audit_limit'] += 500
+                st.rerun()
+
+# --- MAIN CONTROLLER ---
+
+def main():
+    init_db()
+    _inject_css()
+
+    if 'user' not in st.session_state:
+        view_login()
+    else:
+        # Sidebar with OptionMenu
+        from streamlit_option_menu import option_menu
+        with st.sidebar:
+            st.image("https://cdn-icons-png.flaticon.com/512/3135/3135715.png", width=100)
+            st.markdown(f"### {st.session_state['user']['username']}")
+            
+            menu_options = ["Dashboard", "Matières"]
+            icons = ["speedometer2", "journal-bookmark"]
+            
+            if st.session_state['user']['role'] == 'admin':
+                menu_options.append("Admin Panel")
+                icons.append("gear")
+                
+            selected = option_menu(
+                "Menu Principal",
+                menu_options,
+                icons=icons,
+                menu_icon="cast",
+                default_index=0,
+                styles={
+                    "container": {"padding": "5px", "background-color": "#2c3e50"},
+                    "icon": {"color": "orange", "font-size": "25px"}, 
+                    "nav-link": {"font-size": "16px", "text-align": "left", "margin":"0px", "--hover-color": "#eee"},
+                    "nav-link-selected": {"background-color": "#00cc96"},
+                }
+            )
+            
+            st.markdown("---")
+            if st.button("Se déconnecter"):
+                del st.session_state['user']
+                st.rerun()
+
+        # Routing
+        if selected == "Dashboard":
+            view_dashboard()
+        elif selected == "Matières":
+            view_subjects()
+        elif selected == "Admin Panel":
+            if st.session_state['user']['role'] == 'admin':
+                view_admin()
+            else:
+                st.error("Accès non autorisé.")
+
+if __name__ == "__main__":
+    main()